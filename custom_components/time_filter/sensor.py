@@ -1,14 +1,15 @@
 from __future__ import annotations
-from datetime import datetime, timedelta, timezone
-from typing import Optional, Deque
-from collections import deque
+import time
+from typing import Optional
+from array import array
+from math import exp
 
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 from homeassistant.core import HomeAssistant, callback, State
 from homeassistant.components.sensor import SensorEntity, PLATFORM_SCHEMA
 from homeassistant.const import ATTR_UNIT_OF_MEASUREMENT
-from homeassistant.helpers.event import async_track_time_interval, async_track_state_change_event
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event
 from homeassistant.helpers.restore_state import RestoreEntity
 
 from .const import (
@@ -54,6 +55,25 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
 # ------------------------
 # Filter implementations
 # ------------------------
+try:
+    # Optional: compile the scalar kernels to native code when numba is around
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+@njit(cache=True)
+def _lp_update(y: float, x: float, dt: float, neg_inv_tau: float) -> float:
+    # Discrete-time EMA with dt-adaptive alpha: alpha = 1 - exp(-dt/tau)
+    return y + (1.0 - exp(dt * neg_inv_tau)) * (x - y)
+
+@njit(cache=True)
+def _integ_update(acc: float, last_x: float, x: float, dt: float) -> float:
+    # Trapezoidal rule
+    return acc + 0.5 * (last_x + x) * dt
+
 class BaseFilter:
     def __init__(self):
         self.y = 0.0
@@ -63,48 +83,92 @@ class BaseFilter:
         raise NotImplementedError
 
 class TimeSMA(BaseFilter):
-    def __init__(self, window_s: float):
+    def __init__(self, window_s: float, est_rate: float = 10.0):
         super().__init__()
         self.window_s = window_s
-        self.samples: Deque[tuple[float, float]] = deque()  # (timestamp_s, value)
+        # Preallocated ring buffers of unboxed doubles, sized for est_rate
+        # samples/s with 2x headroom; doubled on the fly if they ever fill
+        self._cap = max(16, int(window_s * est_rate * 2))
+        self._ts = array('d', [0.0]) * self._cap  # sample timestamps (s)
+        self._vs = array('d', [0.0]) * self._cap  # sample values
+        self._head = 0      # index of the oldest sample
+        self._size = 0      # number of buffered samples
+        self._area = 0.0    # running trapezoid area over the buffered segments
+        self._t_span = 0.0  # running time span covered by the buffered segments
 
     def tick(self, x: float, dt: float, now_s: float):
-        # Drop samples outside window
+        ts = self._ts
+        vs = self._vs
+        cap = self._cap
+        head = self._head
+        size = self._size
+        # Drop samples outside window, subtracting each expired segment
         cutoff = now_s - self.window_s
-        while self.samples and self.samples[0][0] < cutoff:
-            self.samples.popleft()
-        # Add new sample
-        self.samples.append((now_s, x))
-        # Time-weighted average across the window by linear segments
-        if len(self.samples) > 1:
-            total_area = 0.0
-            total_time = 0.0
-            prev_t, prev_v = self.samples[0]
-            for (t, v) in list(self.samples)[1:]:
-                dt = t - prev_t
-                area = 0.5 * (prev_v + v) * dt
-                total_area += area
-                total_time += dt
-                prev_t, prev_v = t, v
-            if total_time > 0:
-                self.y = total_area / total_time
+        while size and ts[head] < cutoff:
+            t0 = ts[head]
+            v0 = vs[head]
+            head = (head + 1) % cap
+            size -= 1
+            if size:
+                seg_dt = ts[head] - t0
+                self._area -= 0.5 * (v0 + vs[head]) * seg_dt
+                self._t_span -= seg_dt
+        if size == cap:
+            ts, vs, head = self._grow(head)
+            cap = self._cap
+        # Add new sample plus its segment against the previous one
+        tail = (head + size) % cap
+        if size:
+            last = (tail - 1) % cap
+            seg_dt = now_s - ts[last]
+            self._area += 0.5 * (vs[last] + x) * seg_dt
+            self._t_span += seg_dt
+            ts[tail] = now_s
+            vs[tail] = x
+            size += 1
+            if self._t_span > 0:
+                self.y = self._area / self._t_span
         else:
+            ts[tail] = now_s
+            vs[tail] = x
+            size = 1
+            self._area = 0.0
+            self._t_span = 0.0
             self.y = x    # Only one sample
+        self._head = head
+        self._size = size
+        self.last_x = x
+
+    def _grow(self, head: int):
+        # Ring is full: unroll into freshly doubled buffers starting at 0
+        cap = self._cap
+        new_ts = array('d', [0.0]) * (cap * 2)
+        new_vs = array('d', [0.0]) * (cap * 2)
+        for i in range(self._size):
+            j = (head + i) % cap
+            new_ts[i] = self._ts[j]
+            new_vs[i] = self._vs[j]
+        self._ts = new_ts
+        self._vs = new_vs
+        self._cap = cap * 2
+        self._head = 0
+        return new_ts, new_vs, 0
 
 class LowPass(BaseFilter):
     def __init__(self, tau_s: float):
         super().__init__()
         self.tau = tau_s
+        self._neg_inv_tau = -1.0 / tau_s
         self.initialized = False
 
     def tick(self, x: float, dt: float, now_s: float):
         if not self.initialized:
             self.y = x
             self.initialized = True
+            self.last_x = x
             return
-        # Discrete-time EMA with dt-adaptive alpha: alpha = 1 - exp(-dt/tau)
-        alpha = 1.0 - pow(2.718281828, -dt / self.tau)
-        self.y = (1 - alpha) * self.y + alpha * x
+        self.y = _lp_update(self.y, x, dt, self._neg_inv_tau)
+        self.last_x = x
 
 class Integrator(BaseFilter):
     def __init__(self):
@@ -113,9 +177,10 @@ class Integrator(BaseFilter):
     def tick(self, x: float, dt: float, now_s: float):
         # Trapezoidal rule when last_x available; otherwise rectangle
         if self.last_x is not None:
-            self.y += 0.5 * (self.last_x + x) * dt
+            self.y = _integ_update(self.y, self.last_x, x, dt)
         else:
             self.y += x * dt
+        self.last_x = x
 
 # ------------------------
 # Sensor entity
@@ -154,8 +219,14 @@ class TickFilterSensor(SensorEntity, RestoreEntity):
             self._attr_state_class = "total_increasing"
         else:
             raise ValueError(f"Unsupported method {method}")
-        self._last_ts = datetime.now(timezone.utc).timestamp()
-        self._last_src_ts = self._last_ts   # timestamp of last source state
+        # Bind hot-path methods once; the filter choice never changes
+        self._tick = self.filter.tick
+        self._write = self.async_write_ha_state
+        self._last_ts = time.monotonic()
+        self._last_src_ts: Optional[float] = None  # timestamp of last source state
+        self._inv_scale = 1.0               # source -> destination unit factor
+        self._last_src_unit: Optional[str] = None
+        self._units_resolved = False
         self._unsub = None
         self._unsub_state = None
 
@@ -172,16 +243,20 @@ class TickFilterSensor(SensorEntity, RestoreEntity):
         # Query initial source state
         src_state = self.hass.states.get(self._source)
         if src_state is not None:
-            await self._state_listener(
+            self._state_listener(
                 type("Event", (object,), {"data": {"new_state": src_state}})  # Mock event
             )
 
         # Listen to source state changes for immediate updates
         self._unsub_state = async_track_state_change_event(self.hass, [self._source], self._state_listener)
 
-        # Periodic ticker always runs; we decide inside whether to emit
-        interval = timedelta(seconds = self._update_s / 4) # tick more often than update_s
-        self._unsub = async_track_time_interval(self.hass, self._async_tick, interval)
+        # Fallback ticker: self-rescheduling timer aimed at the next deadline
+        self._schedule_tick(self._update_s)
+
+    def _schedule_tick(self, delay: float):
+        if self._unsub:
+            self._unsub()
+        self._unsub = async_call_later(self.hass, delay, self._async_tick)
 
     async def async_will_remove_from_hass(self) -> None:
         if self._unsub:
@@ -192,16 +267,31 @@ class TickFilterSensor(SensorEntity, RestoreEntity):
             self._unsub_state = None
 
     @callback
-    async def _state_listener(self, event):
+    def _state_listener(self, event):
         new_state: State | None = event.data.get("new_state")
         if new_state is None or new_state.entity_id != self._source:
             return
         # Update last source event time
-        now_s = datetime.now(timezone.utc).timestamp()
+        now_s = time.monotonic()
         self._last_src_ts = now_s
+        # Push the fallback deadline out to update_s from this event
+        self._schedule_tick(self._update_s)
+        # Resolve units/scale once; re-resolve only if the source unit changes
+        attrs = new_state.attributes
+        src_unit = attrs.get(ATTR_UNIT_OF_MEASUREMENT)
+        if not self._units_resolved or src_unit is not self._last_src_unit:
+            self._resolve_units(new_state, src_unit)
+        # Parse new input value
+        raw = new_state.state
+        try:
+            x = float(raw) * self._inv_scale
+        except (TypeError, ValueError):
+            x = self.filter.last_x
+        self._update_filter(now_s, x)
+
+    def _resolve_units(self, new_state: State, src_unit: Optional[str]):
         # Auto assign unit if not set
         dst_unit = self._attr_native_unit_of_measurement
-        src_unit = new_state.attributes.get(ATTR_UNIT_OF_MEASUREMENT)
         if dst_unit is None and src_unit is not None:
             if self._method == METHOD_INTEGRATOR:
                 dst_unit = src_unit + 'h'
@@ -213,8 +303,9 @@ class TickFilterSensor(SensorEntity, RestoreEntity):
         if src_unit is not None and dst_unit is not None:
             if src_unit == dst_unit:
                 # Copy device/state class from source
-                self._attr_state_class = new_state.attributes.get("state_class")
-                self._attr_device_class = new_state.attributes.get("device_class")
+                attrs = new_state.attributes
+                self._attr_state_class = attrs.get("state_class")
+                self._attr_device_class = attrs.get("device_class")
             else:
                 if self._method == METHOD_INTEGRATOR:
                     if src_unit in ("W", "kW"):
@@ -223,34 +314,45 @@ class TickFilterSensor(SensorEntity, RestoreEntity):
                     scale = 3600.0
                 elif 'k' + src_unit + 'h' == dst_unit:
                     scale = 3600000.0
-        # Parse new input value
-        try:
-            x = float(new_state.state) / scale
-        except (TypeError, ValueError):
-            x = self.filter.last_x
-        self._update_filter(now_s, x)
+        self._inv_scale = 1.0 / scale
+        self._last_src_unit = src_unit
+        self._units_resolved = True
 
     @callback
-    async def _async_tick(self, _now):
-        now_s = datetime.now(timezone.utc).timestamp()
-        # Only fallback-tick if we haven't seen a source event in update_s
-        if (now_s - self._last_src_ts) < self._update_s:
+    def _async_tick(self, _now):
+        self._unsub = None
+        # True no-op until the first source event arrives
+        if self._last_src_ts is None:
+            self._schedule_tick(self._update_s)
             return
-        self._update_filter(now_s, self.filter.last_x)
+        now_s = time.monotonic()
+        # Only fallback-tick if we haven't seen a source event in update_s
+        since_src = now_s - self._last_src_ts
+        if since_src >= self._update_s:
+            self._update_filter(now_s, self.filter.last_x)
+            delay = self._update_s
+        else:
+            delay = max(0.1, self._update_s - since_src)
+        self._schedule_tick(delay)
 
     def _update_filter(self, now_s: float, x: float):
         if x is None:
             return
         # Update filter state
         dt = max(0.0, now_s - self._last_ts)
+        if dt < 1e-3 and self._attr_native_value is not None:
+            # Same-instant duplicate event: remember x for the next segment,
+            # skip the zero-width tick and the state push
+            self.filter.last_x = x
+            return
         self._last_ts = now_s
-        self.filter.tick(x, dt, now_s)
-        self.filter.last_x = x
-        if self._round is None:
-            self._attr_native_value = self.filter.y
-        else:
-            self._attr_native_value = round(self.filter.y, self._round)
-        self.async_write_ha_state()
+        self._tick(x, dt, now_s)
+        new_val = self.filter.y if self._round is None else round(self.filter.y, self._round)
+        # Skip the bus write when nothing changed, unless force_update republishes
+        if new_val == self._attr_native_value and not self._attr_force_update:
+            return
+        self._attr_native_value = new_val
+        self._write()
 
 # ------------------------
 # Platform setup